@@ -0,0 +1,153 @@
+import time
+import threading
+from functools import wraps
+
+
+class ConcurrencyLimiter:
+    """Ограничивает число одновременных запросов на каждый маршрут.
+
+    Для маршрута задаётся бюджет (max_concurrent, max_waiting): не больше max_concurrent
+    запросов выполняются одновременно и не больше max_waiting ждут освобождения места
+    (не дольше max_wait секунд). Остальные запросы сразу отклоняются.
+    """
+
+    def __init__(self, budgets, default_budget=(8, 16), max_wait=2.0):
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def get_route(self, route):
+        with self.lock:
+            if route not in self.routes:
+                max_concurrent, max_waiting = self.budgets.get(route, self.default_budget)
+                self.routes[route] = {
+                    'condition': threading.Condition(),
+                    'max_concurrent': max_concurrent,
+                    'max_waiting': max_waiting,
+                    'active': 0,
+                    'waiting': 0,
+                    'admitted': 0,
+                    'rejected': 0
+                }
+            return self.routes[route]
+
+    def acquire(self, route):
+        """Занимает место для запроса. Возвращает False, если запрос нужно отклонить."""
+        state = self.get_route(route)
+        with state['condition']:
+            if state['active'] >= state['max_concurrent']:
+                if state['waiting'] >= state['max_waiting']:
+                    state['rejected'] += 1
+                    return False
+
+                state['waiting'] += 1
+                deadline = time.monotonic() + self.max_wait
+                try:
+                    while state['active'] >= state['max_concurrent']:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            state['rejected'] += 1
+                            return False
+                        state['condition'].wait(remaining)
+                finally:
+                    state['waiting'] -= 1
+
+            state['active'] += 1
+            state['admitted'] += 1
+            return True
+
+    def release(self, route):
+        state = self.get_route(route)
+        with state['condition']:
+            state['active'] -= 1
+            state['condition'].notify()
+
+    def limit(self, route, busy_response):
+        """Декоратор для view-функции Flask. busy_response вызывается, если запрос отклонён."""
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.acquire(route):
+                    return busy_response()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.release(route)
+
+            return wrapper
+
+        return decorator
+
+    def stats(self):
+        with self.lock:
+            routes = dict(self.routes)
+        return {
+            route: {key: state[key] for key in ('max_concurrent', 'max_waiting', 'active', 'waiting', 'admitted', 'rejected')}
+            for route, state in routes.items()
+        }
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Размыкается после failure_threshold сбоев подряд и отклоняет вызовы reset_timeout секунд.
+
+    После паузы пропускает один пробный вызов: успех замыкает цепь, сбой снова размыкает.
+    is_failure решает, считать ли исключение сбоем зависимости (по умолчанию — любое).
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, is_failure=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure or (lambda e: True)
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0
+        self.rejected = 0
+
+    def allow(self):
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self, e):
+        if not self.is_failure(e):
+            self.record_success()
+            return
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def call(self, func, *args, **kwargs):
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit breaker is open")
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self.lock:
+            return {'state': self.state, 'failures': self.failures, 'rejected': self.rejected}
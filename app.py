@@ -1,13 +1,19 @@
 import os
+import io
 import json
 import shlex
 import logging
-from flask import Flask, request, jsonify
-from slack_sdk import WebClient
+from functools import wraps
+from flask import Flask, request, jsonify, Response
 from slack_sdk.errors import SlackApiError
 from dotenv import load_dotenv
-from queue_manager import QueueManager
+from queue_manager import QueueManager, SUPPORTED_LANGUAGES
 from sheets_manager import SheetsManager
+from slack_client import SlackClient
+from admission import ConcurrencyLimiter
+from shift_scheduler import ShiftScheduler, parse_days, parse_time_range, validate_pause, format_shift
+from roster import import_roster, export_roster, export_language_matrix, ROSTER_FORMATS
+from history_manager import HistoryManager, format_duration
 from datetime import datetime
 import pytz
 
@@ -16,12 +22,113 @@ load_dotenv()
 SLACK_BOT_TOKEN = os.getenv('SLACK_BOT_TOKEN')
 GENERAL_CHANNEL_ID = os.getenv('GENERAL_CHANNEL_ID')
 ALLOWED_USER_GROUP = os.getenv('ALLOWED_USER_GROUP')
+ADMIN_API_TOKEN = os.getenv('ADMIN_API_TOKEN')
 AWAITING_TASKS_FILE = 'awaiting_tasks.json'
+SLACK_ASYNC_MODE = os.getenv('SLACK_ASYNC_MODE', '').lower() in ('1', 'true', 'yes')
+SLACK_POOL_SIZE = int(os.getenv('SLACK_POOL_SIZE', '100'))
+
+# Бюджеты маршрутов: (одновременных запросов, ожидающих в очереди)
+ROUTE_BUDGETS = {
+    'queue': (8, 16),
+    'createtask': (4, 8),
+    'forcetask': (2, 4),
+    'assigntask': (2, 4),
+    'give-task-from-awaiting-list': (2, 4),
+    'interactivity': (8, 16),
+    'roster': (1, 0)
+}
 
 app = Flask(__name__)
-client = WebClient(token=SLACK_BOT_TOKEN)
+client = SlackClient(SLACK_BOT_TOKEN, async_mode=SLACK_ASYNC_MODE, pool_size=SLACK_POOL_SIZE)
 queue_manager = QueueManager()
 sheets_manager = SheetsManager()
+history_manager = HistoryManager()
+# Ждём место не дольше 2 секунд: Slack ждёт ответ на slash-команду 3 секунды
+limiter = ConcurrencyLimiter(ROUTE_BUDGETS, max_wait=2.0)
+
+def announce_shift_changes(text):
+    try:
+        client.chat_postMessage(channel=GENERAL_CHANNEL_ID, text=text)
+    except SlackApiError as e:
+        logging.error(f"Failed to announce shift changes: {e.response['error']}")
+
+# Автоматически добавляем, ставим на паузу и убираем операторов по расписанию смен
+shift_scheduler = ShiftScheduler(queue_manager, announce_shift_changes)
+
+SHEETS_BACKFILL_INTERVAL = int(os.getenv('SHEETS_BACKFILL_INTERVAL', '300'))
+
+def start_background_jobs():
+    """Запускает фоновые задачи. Вызывать только в процессе, который обслуживает запросы."""
+    shift_scheduler.start()
+
+    # Периодически дозаписываем в Google Sheet строки, которые не удалось записать сразу
+    if SHEETS_BACKFILL_INTERVAL > 0:
+        sheets_manager.start_backfill_loop(SHEETS_BACKFILL_INTERVAL)
+
+def busy_response():
+    return jsonify({'response_type': 'ephemeral', 'text': 'The bot is busy right now, please retry in a few seconds.'})
+
+def interactivity_busy_response():
+    # Ответ на отправку модального окна должен быть response_action, иначе Slack покажет ошибку соединения
+    try:
+        payload = json.loads(request.form.get('payload'))
+    except (TypeError, ValueError):
+        return ''
+    if payload.get('type') != 'view_submission':
+        return ''
+
+    input_blocks = [block['block_id'] for block in payload['view'].get('blocks', []) if block.get('type') == 'input' and block.get('block_id')]
+    if not input_blocks:
+        return ''
+    return jsonify({'response_action': 'errors', 'errors': {input_blocks[0]: 'The bot is busy right now, please submit again in a few seconds.'}})
+
+def roster_busy_response():
+    return jsonify({'imported': 0, 'errors': ['Another roster request is in progress, please retry later.']}), 503
+
+def require_admin_token(func):
+    """Пускает к админскому эндпоинту вне Slack только запросы с ADMIN_API_TOKEN."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_API_TOKEN or request.headers.get('Authorization') != f'Bearer {ADMIN_API_TOKEN}':
+            return jsonify({'error': 'Forbidden.'}), 403
+        return func(*args, **kwargs)
+
+    return wrapper
+
+@app.route('/admission-stats', methods=['GET'])
+def handle_admission_stats():
+    return jsonify({
+        'routes': limiter.stats(),
+        'circuit_breakers': {
+            'slack': client.breaker.stats(),
+            'sheets': sheets_manager.breaker.stats()
+        }
+    })
+
+@app.route('/roster', methods=['GET', 'POST'])
+@require_admin_token
+@limiter.limit('roster', roster_busy_response)
+def handle_roster():
+    fmt = request.args.get('format', 'csv')
+    if request.method == 'GET':
+        out = io.StringIO()
+        if fmt == 'matrix':
+            export_language_matrix(queue_manager.registered_users, out)
+            return Response(out.getvalue(), mimetype='text/csv')
+        if fmt not in ROSTER_FORMATS:
+            return jsonify({'error': f'Unsupported format: {fmt}.'}), 400
+        export_roster(queue_manager.registered_users, fmt, out)
+        return Response(out.getvalue(), mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson')
+
+    if fmt not in ROSTER_FORMATS:
+        return jsonify({'error': f'Unsupported format: {fmt}.'}), 400
+    replace = request.args.get('replace', '').lower() in ('1', 'true', 'yes')
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    imported, errors = import_roster(queue_manager, stream, fmt, client=client, replace=replace)
+    if errors:
+        return jsonify({'imported': 0, 'errors': errors}), 400
+    shift_scheduler.reschedule()
+    return jsonify({'imported': imported, 'errors': []})
 
 def get_user_groups(user_id):
     try:
@@ -43,6 +150,7 @@ def get_display_name(user_id):
         return None
 
 @app.route('/queue', methods=['POST'])
+@limiter.limit('queue', busy_response)
 def handle_queue_command():
     data = request.form
     command_text = data.get('text').strip()
@@ -75,10 +183,19 @@ def handle_queue_command():
         return handle_removeop_command(user_id, args)
     elif command == 'taskline':
         return handle_taskline_command()
+    elif command == 'stats':
+        return handle_stats_command(args)
+    elif command == 'addshift':
+        return handle_addshift_command(user_id, args)
+    elif command == 'clearshift':
+        return handle_clearshift_command(user_id, args)
+    elif command == 'shifts':
+        return handle_shifts_command()
     else:
         return jsonify({'response_type': 'ephemeral', 'text': 'Incorrect usage of the command.'})
 
 @app.route('/createtask', methods=['POST'])
+@limiter.limit('createtask', busy_response)
 def handle_create_command():
     data = request.form
     command_text = data.get('text', '').strip()
@@ -101,6 +218,7 @@ def handle_create_command():
     return jsonify(result)
 
 @app.route('/forcetask', methods=['POST'])
+@limiter.limit('forcetask', busy_response)
 def handle_force_task_command():
     data = request.form
     command_text = data.get('text', '').strip()
@@ -123,6 +241,7 @@ def handle_force_task_command():
     return jsonify(result)
 
 @app.route('/assigntask', methods=['POST'])
+@limiter.limit('assigntask', busy_response)
 def handle_assignetask_command():
     data = request.form
     command_text = data.get('text').strip()
@@ -158,6 +277,7 @@ def handle_removeop_command(user_id, args):
     return jsonify({'response_type': 'ephemeral', 'text': f'<@{user_to_remove["user_id"]}> [{", ".join(user_to_remove["languages"])}] has been removed from the queue.'})
 
 @app.route('/give-task-from-awaiting-list', methods=['POST'])
+@limiter.limit('give-task-from-awaiting-list', busy_response)
 def handle_give_task_from_awaiting_list():
     data = request.form
     user_id = data.get('user_id')
@@ -191,6 +311,8 @@ def handle_give_task_from_awaiting_list():
         return jsonify({'response_type': 'ephemeral', 'text': f'User with display name {target_display_name} not found.'})
 
     target_user_id = user_to_assign['user_id']
+    # Поиск по имени не учитывает регистр, поэтому дальше используем имя из реестра
+    display_name = user_to_assign['display_name']
 
     try:
         # Отправить сообщение о задаче в Slack
@@ -204,7 +326,8 @@ def handle_give_task_from_awaiting_list():
         current_time = datetime.now(ukraine_tz).strftime('%Y-%m-%d %H:%M:%S')
 
         # Запускаем добавление задачи в Google Sheet в фоне
-        sheets_manager.add_task_to_sheet_async(current_time, message, language, target_display_name)
+        sheets_manager.add_task_to_sheet_async(current_time, message, language, display_name)
+        record_assignment(target_user_id, display_name, message, language, 'awaiting_list', task.get('created_at'))
 
         # Удалить пользователя из очереди, если он есть
         if queue_manager.is_user_in_queue(target_user_id):
@@ -214,7 +337,7 @@ def handle_give_task_from_awaiting_list():
         awaiting_tasks.pop(task_number)
         save_awaiting_tasks(awaiting_tasks)
 
-        return jsonify({'response_type': 'ephemeral', 'text': f'Task assigned to {target_display_name}: {message} ({language}).'})
+        return jsonify({'response_type': 'ephemeral', 'text': f'Task assigned to {display_name}: {message} ({language}).'})
     except SlackApiError as e:
         logging.error(f"Failed to distribute task: {e.response['error']}")
         return jsonify({'response_type': 'ephemeral', 'text': 'Failed to distribute task.'})
@@ -228,6 +351,9 @@ def handle_register_command(user_id, trigger_id):
     if not display_name:
         return jsonify({'response_type': 'ephemeral', 'text': 'Failed to retrieve display name.'})
 
+    if queue_manager.is_display_name_taken(display_name, user_id):
+        return jsonify({'response_type': 'ephemeral', 'text': f'Display name {display_name} is already used by another operator. Please change your Slack display name or contact an admin.'})
+
     try:
         client.views_open(
             trigger_id=trigger_id,
@@ -243,14 +369,8 @@ def handle_register_command(user_id, trigger_id):
                         "element": {
                             "type": "checkboxes",
                             "options": [
-                                {"text": {"type": "plain_text", "text": "RU"}, "value": "RU"},
-                                {"text": {"type": "plain_text", "text": "UA"}, "value": "UA"},
-                                {"text": {"type": "plain_text", "text": "EN"}, "value": "EN"},
-                                {"text": {"type": "plain_text", "text": "KA"}, "value": "KA"},
-                                {"text": {"type": "plain_text", "text": "TR"}, "value": "TR"},
-                                {"text": {"type": "plain_text", "text": "PL"}, "value": "PL"},
-                                {"text": {"type": "plain_text", "text": "ES"}, "value": "ES"},
-                                {"text": {"type": "plain_text", "text": "PT"}, "value": "PT"}
+                                {"text": {"type": "plain_text", "text": lang}, "value": lang}
+                                for lang in SUPPORTED_LANGUAGES
                             ],
                             "action_id": "language_selection"
                         },
@@ -271,6 +391,84 @@ def handle_taskline_command():
     task_list = "\n".join([f"{i + 1}. Message: {task['message']}, Language: {task['language']}" for i, task in enumerate(awaiting_tasks)])
     return jsonify({'response_type': 'ephemeral', 'text': f'Awaiting tasks:\n{task_list}'})
 
+def handle_stats_command(args):
+    try:
+        days = int(args[1]) if len(args) > 1 else 7
+    except ValueError:
+        return jsonify({'response_type': 'ephemeral', 'text': 'Invalid number of days. Use: /queue stats [days].'})
+    if days < 1 or days > history_manager.retention_days:
+        return jsonify({'response_type': 'ephemeral', 'text': f'Number of days must be between 1 and {history_manager.retention_days}.'})
+
+    summary = history_manager.summarize(days)
+
+    # Возраст бэклога считаем по самой старой ожидающей задаче
+    awaiting_tasks = load_awaiting_tasks()
+    backlog_ages = [history_manager.age_seconds(task['created_at']) for task in awaiting_tasks if task.get('created_at')]
+    backlog_age = format_duration(max(backlog_ages)) if backlog_ages else 'n/a'
+
+    operators = sorted(summary['by_operator'].items(), key=lambda item: item[1]['count'], reverse=True)
+    languages = sorted(summary['by_language'].items(), key=lambda item: item[1], reverse=True)
+    median = format_duration(summary['wait_median']) if summary['wait_median'] is not None else 'n/a'
+    p95 = format_duration(summary['wait_p95']) if summary['wait_p95'] is not None else 'n/a'
+
+    lines = [f'Stats for the last {days} day(s): {summary["total"]} assignment(s).']
+    lines.append('By operator: ' + (', '.join(f'<@{user_id}> {operator["count"]}' for user_id, operator in operators) or 'none'))
+    lines.append('By language: ' + (', '.join(f'{language} {count}' for language, count in languages) or 'none'))
+    lines.append(f'Wait time: median {median}, p95 {p95}.')
+    lines.append(f'Backlog: {len(awaiting_tasks)} task(s), oldest waiting {backlog_age}.')
+    return jsonify({'response_type': 'ephemeral', 'text': '\n'.join(lines)})
+
+def handle_addshift_command(user_id, args):
+    if not user_in_allowed_group(user_id):
+        return jsonify({'response_type': 'ephemeral', 'text': 'You do not have permission to perform this action.'})
+
+    if len(args) not in (4, 5):
+        return jsonify({'response_type': 'ephemeral', 'text': 'Use: /queue addshift "display_name" mon-fri 09:00-17:00 [13:00-14:00].'})
+
+    target_display_name = args[1].strip('"')
+    user = queue_manager.get_user_by_display_name(target_display_name)
+    if not user:
+        return jsonify({'response_type': 'ephemeral', 'text': f'Operator with display name {target_display_name} not found.'})
+
+    try:
+        start, end = parse_time_range(args[3])
+        shift = {'days': parse_days(args[2]), 'start': start, 'end': end}
+        if len(args) == 5:
+            shift['pause_start'], shift['pause_end'] = parse_time_range(args[4])
+            validate_pause(shift)
+    except ValueError as e:
+        return jsonify({'response_type': 'ephemeral', 'text': str(e)})
+
+    queue_manager.set_user_shifts(user['user_id'], user.get('shifts', []) + [shift])
+    shift_scheduler.reschedule()
+    # Если смена уже идёт, сразу ставим оператора в очередь, не дожидаясь следующей границы
+    shift_scheduler.apply_active_shifts({user['user_id']})
+    return jsonify({'response_type': 'ephemeral', 'text': f'Shift added for {user["display_name"]}: {format_shift(shift)} (Europe/Kyiv).'})
+
+def handle_clearshift_command(user_id, args):
+    if not user_in_allowed_group(user_id):
+        return jsonify({'response_type': 'ephemeral', 'text': 'You do not have permission to perform this action.'})
+
+    if len(args) != 2:
+        return jsonify({'response_type': 'ephemeral', 'text': 'Please provide the display name in quotes.'})
+
+    target_display_name = args[1].strip('"')
+    user = queue_manager.get_user_by_display_name(target_display_name)
+    if not user:
+        return jsonify({'response_type': 'ephemeral', 'text': f'Operator with display name {target_display_name} not found.'})
+
+    queue_manager.set_user_shifts(user['user_id'], [])
+    shift_scheduler.reschedule()
+    return jsonify({'response_type': 'ephemeral', 'text': f'Shifts cleared for {user["display_name"]}.'})
+
+def handle_shifts_command():
+    shift_list = "\n".join([
+        f"<@{user['user_id']}>: {'; '.join(format_shift(shift) for shift in user['shifts'])}"
+        for user in queue_manager.registered_users if user.get('shifts')
+    ])
+    if not shift_list:
+        return jsonify({'response_type': 'ephemeral', 'text': 'No shifts scheduled.'})
+    return jsonify({'response_type': 'ephemeral', 'text': f'Shifts (Europe/Kyiv):\n{shift_list}'})
 
 def handle_list_command(user_id):
     queue = queue_manager.list_queue()
@@ -284,51 +482,54 @@ def handle_add_command(user_id):
     if queue_manager.is_user_in_queue(user_id):
         return jsonify({'response_type': 'ephemeral', 'text': 'You are already in the queue.'})
 
+    languages = queue_manager.get_user_languages(user_id)
+
+    # Проверяем ожидающие задачи: назначаем первую подходящую по языку
+    awaiting_tasks = load_awaiting_tasks()
+    task = next((task for task in awaiting_tasks if task['language'] in languages), None)
+
+    # Независимые вызовы Slack отправляем одновременно: текст сообщения о задаче
+    # зависит только от user_id и задачи, а не от информации о пользователе
+    user_info_future = client.submit('users_info', user=user_id)
+    post_future = None
+    if task:
+        post_future = client.submit(
+            'chat_postMessage',
+            channel=GENERAL_CHANNEL_ID,
+            text=f"{task['message']} <@{user_id}> ({task['language']})"
+        )
+
     try:
-        # Получаем информацию о пользователе из Slack
-        user_info = client.users_info(user=user_id)
+        user_info = user_info_future.result()
         display_name = user_info['user']['profile']['display_name'] or user_info['user']['name']
     except SlackApiError as e:
         logging.error(f"Error fetching user info: {e.response['error']}")
-        return jsonify({'response_type': 'ephemeral', 'text': 'Failed to fetch user info.'})
+        # Сообщение о задаче могло уже уйти, поэтому берём имя из реестра
+        display_name = queue_manager.get_display_name(user_id)
+        if not display_name:
+            return jsonify({'response_type': 'ephemeral', 'text': 'Failed to fetch user info.'})
 
-    languages = queue_manager.get_user_languages(user_id)
+    if post_future:
+        try:
+            post_future.result()
 
-    # Проверяем ожидающие задачи
-    awaiting_tasks = load_awaiting_tasks()
-    assigned_tasks = []
-
-    for task in awaiting_tasks:
-        if task['language'] in languages:
-            try:
-                # Отправить сообщение о задаче в Slack
-                client.chat_postMessage(
-                    channel=GENERAL_CHANNEL_ID,
-                    text=f"{task['message']} <@{user_id}> ({task['language']})"
-                )
-
-                # Получаем текущее время в часовом поясе Украины
-                ukraine_tz = pytz.timezone('Europe/Kyiv')
-                current_time = datetime.now(ukraine_tz).strftime('%Y-%m-%d %H:%M:%S')
-
-                # Запускаем добавление задачи в Google Sheet в фоне
-                sheets_manager.add_task_to_sheet_async(current_time, task['message'], task['language'], display_name)
-
-                # Удалить пользователя из очереди
-                queue_manager.remove_user_from_queue(user_id)
-
-                # Добавляем задачу в список назначенных задач
-                assigned_tasks.append(task)
-                break  # Назначаем только одну задачу и выходим из цикла
-            except SlackApiError as e:
-                logging.error(f"Failed to assign awaiting task: {e.response['error']}")
-
-    # Удаляем назначенные задачи из списка ожидающих задач
-    if assigned_tasks:
-        for task in assigned_tasks:
+            # Получаем текущее время в часовом поясе Украины
+            ukraine_tz = pytz.timezone('Europe/Kyiv')
+            current_time = datetime.now(ukraine_tz).strftime('%Y-%m-%d %H:%M:%S')
+
+            # Запускаем добавление задачи в Google Sheet в фоне
+            sheets_manager.add_task_to_sheet_async(current_time, task['message'], task['language'], display_name)
+            record_assignment(user_id, display_name, task['message'], task['language'], 'awaiting_add', task.get('created_at'))
+
+            # Удалить пользователя из очереди
+            queue_manager.remove_user_from_queue(user_id)
+
+            # Удаляем назначенную задачу из списка ожидающих задач
             awaiting_tasks.remove(task)
-        save_awaiting_tasks(awaiting_tasks)
-        return jsonify({'response_type': 'ephemeral', 'text': 'Task from awaiting list assigned to you.'})
+            save_awaiting_tasks(awaiting_tasks)
+            return jsonify({'response_type': 'ephemeral', 'text': 'Task from awaiting list assigned to you.'})
+        except SlackApiError as e:
+            logging.error(f"Failed to assign awaiting task: {e.response['error']}")
 
     # Если задачи не были назначены, добавляем пользователя в очередь
     queue_manager.add_user_to_queue(user_id, display_name)
@@ -424,14 +625,8 @@ def handle_editreg_command(user_id, args, trigger_id):
                         "element": {
                             "type": "checkboxes",
                             "options": [
-                                {"text": {"type": "plain_text", "text": "RU"}, "value": "RU"},
-                                {"text": {"type": "plain_text", "text": "UA"}, "value": "UA"},
-                                {"text": {"type": "plain_text", "text": "EN"}, "value": "EN"},
-                                {"text": {"type": "plain_text", "text": "KA"}, "value": "KA"},
-                                {"text": {"type": "plain_text", "text": "TR"}, "value": "TR"},
-                                {"text": {"type": "plain_text", "text": "PL"}, "value": "PL"},
-                                {"text": {"type": "plain_text", "text": "ES"}, "value": "ES"},
-                                {"text": {"type": "plain_text", "text": "PT"}, "value": "PT"}
+                                {"text": {"type": "plain_text", "text": lang}, "value": lang}
+                                for lang in SUPPORTED_LANGUAGES
                             ],
                             "action_id": "language_selection",
                             "initial_options": [
@@ -468,6 +663,7 @@ def handle_create_task_command(user_id, message, language):
 
             # Запускаем добавление задачи в Google Sheet в фоне
             sheets_manager.add_task_to_sheet_async(current_time, message, language, display_name)
+            record_assignment(first_user['user_id'], display_name, message, language, 'create')
 
             # Удалить пользователя из очереди
             queue_manager.remove_user_from_queue(first_user['user_id'])
@@ -500,6 +696,7 @@ def handle_force_task_command_logic(user_id, message, language):
 
             # Запускаем добавление задачи в Google Sheet в фоне
             sheets_manager.add_task_to_sheet_async(current_time, message, language, display_name)
+            record_assignment(first_user['user_id'], display_name, message, language, 'force')
 
             # Удалить пользователя из очереди
             queue_manager.remove_user_from_queue(first_user['user_id'])
@@ -536,6 +733,7 @@ def handle_assign_task_command(target_user_display_name, message, language):
 
         # Запускаем добавление задачи в Google Sheet в фоне
         sheets_manager.add_task_to_sheet_async(current_time, message, language, display_name)
+        record_assignment(target_user_id, display_name, message, language, 'assign')
 
         if queue_manager.is_user_in_queue(target_user_id):
             queue_manager.remove_user_from_queue(target_user_id)
@@ -579,10 +777,19 @@ def save_awaiting_tasks(tasks):
 def add_task_to_awaiting(message, language):
     """Добавляет задачу в список ожидающих задач."""
     tasks = load_awaiting_tasks()
-    tasks.append({'message': message, 'language': language})
+    ukraine_tz = pytz.timezone('Europe/Kyiv')
+    tasks.append({'message': message, 'language': language, 'created_at': datetime.now(ukraine_tz).isoformat()})
     save_awaiting_tasks(tasks)
+
+def record_assignment(user_id, display_name, message, language, source, created_at=None):
+    """Записывает назначение в локальную историю. Ошибки истории не должны ломать назначение задачи."""
+    try:
+        history_manager.record_assignment(user_id, display_name, message, language, source, created_at)
+    except Exception as e:
+        logging.error(f"Failed to record assignment history: {e}")
        
 @app.route('/interactivity', methods=['POST'])
+@limiter.limit('interactivity', interactivity_busy_response)
 def handle_interactivity():
     payload = json.loads(request.form.get('payload'))
 
@@ -597,7 +804,8 @@ def handle_interactivity():
             if not display_name:
                 return jsonify({'response_type': 'ephemeral', 'text': 'Failed to retrieve display name.'})
 
-            queue_manager.register_user(user_id, selected_languages, display_name)
+            if not queue_manager.register_user(user_id, selected_languages, display_name):
+                return jsonify({'response_action': 'errors', 'errors': {'languages': f'You are already registered or display name {display_name} is already used by another operator.'}})
             return client.chat_postMessage(channel=GENERAL_CHANNEL_ID, text=f"<@{user_id}> [{', '.join(selected_languages)}] has been successfully registered.")
         
         elif callback_id == 'edit_language_selection':
@@ -622,4 +830,8 @@ def handle_interactivity():
     return jsonify({})
 
 if __name__ == '__main__':
+    # С debug=True Werkzeug запускает наблюдающий процесс и дочерний, который обслуживает
+    # запросы (WERKZEUG_RUN_MAIN=true); фоновые задачи нужны только в дочернем
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_jobs()
     app.run(debug=True)
@@ -0,0 +1,18 @@
+import argparse
+import logging
+from sheets_manager import SheetsManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upload rows from the local pending log that are missing in Google Sheet.')
+    parser.add_argument('--batch-size', type=int, default=500, help='Number of rows per batched write.')
+    parser.add_argument('--min-age', type=int, default=60, help='Skip rows queued less than this many seconds ago.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    written = SheetsManager().backfill_pending_rows(batch_size=args.batch_size, min_age=args.min_age)
+    print(f"Backfilled {written} row(s).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+# Корневой conftest: pytest добавляет каталог проекта в sys.path, чтобы тесты импортировали модули
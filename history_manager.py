@@ -0,0 +1,168 @@
+import os
+import json
+import math
+import threading
+from datetime import datetime, timedelta
+import pytz
+
+# Границы корзин гистограммы времени ожидания (в секундах)
+WAIT_BUCKETS = [0, 10, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 14400, 28800, 86400]
+
+
+def format_duration(seconds):
+    """Форматирует длительность в секундах в короткую строку (например, 1h 05m)."""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h {minutes:02d}m"
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours:02d}h"
+
+
+class HistoryManager:
+    def __init__(self, retention_days=90):
+        self.history_dir = 'history'
+        self.stats_file = 'history_stats.json'
+        self.retention_days = retention_days
+        self.timezone = pytz.timezone('Europe/Kyiv')
+        self.lock = threading.Lock()
+        self.stats = self.load_stats()
+
+    def load_stats(self):
+        try:
+            with open(self.stats_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'days': {}}
+
+    def save_stats(self):
+        # Пишем во временный файл и атомарно подменяем, чтобы не потерять агрегаты при сбое
+        tmp_file = f"{self.stats_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self.stats, f, indent=4)
+        os.replace(tmp_file, self.stats_file)
+
+    def now(self):
+        return datetime.now(self.timezone)
+
+    def age_seconds(self, created_at):
+        """Возвращает возраст ISO-метки времени в секундах (0, если метка отсутствует или некорректна)."""
+        if not created_at:
+            return 0
+        try:
+            return max(0, (self.now() - datetime.fromisoformat(created_at)).total_seconds())
+        except (TypeError, ValueError):
+            return 0
+
+    def partition_file(self, moment):
+        """Путь к файлу-партиции истории за день (по времени Киева)."""
+        return os.path.join(self.history_dir, f"assignments-{moment.strftime('%Y-%m-%d')}.jsonl")
+
+    def append_event(self, event, moment):
+        os.makedirs(self.history_dir, exist_ok=True)
+        with open(self.partition_file(moment), 'a') as f:
+            f.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+    def record_assignment(self, user_id, display_name, message, language, source, created_at=None):
+        """Записывает событие назначения задачи в историю и обновляет дневные агрегаты."""
+        moment = self.now()
+        wait_seconds = self.age_seconds(created_at)
+        event = {
+            'timestamp': moment.isoformat(),
+            'created_at': created_at or moment.isoformat(),
+            'wait_seconds': wait_seconds,
+            'user_id': user_id,
+            'display_name': display_name,
+            'message': message,
+            'language': language,
+            'source': source
+        }
+
+        with self.lock:
+            self.append_event(event, moment)
+            self.update_day_stats(moment.strftime('%Y-%m-%d'), user_id, display_name, language, wait_seconds)
+            self.prune_stats(moment)
+            self.save_stats()
+        return event
+
+    def update_day_stats(self, day, user_id, display_name, language, wait_seconds):
+        day_stats = self.stats['days'].setdefault(day, {
+            'total': 0,
+            'by_operator': {},
+            'by_language': {},
+            'wait_histogram': [0] * (len(WAIT_BUCKETS) + 1),
+            'wait_max': 0
+        })
+        day_stats['total'] += 1
+
+        operator = day_stats['by_operator'].setdefault(user_id, {'display_name': display_name, 'count': 0})
+        operator['display_name'] = display_name
+        operator['count'] += 1
+
+        day_stats['by_language'][language] = day_stats['by_language'].get(language, 0) + 1
+
+        bucket = next((i for i, bound in enumerate(WAIT_BUCKETS) if wait_seconds <= bound), len(WAIT_BUCKETS))
+        day_stats['wait_histogram'][bucket] += 1
+        day_stats['wait_max'] = max(day_stats['wait_max'], wait_seconds)
+
+    def prune_stats(self, moment):
+        """Удаляет дневные агрегаты старше срока хранения (сами партиции истории не трогаются)."""
+        cutoff = (moment - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        for day in [day for day in self.stats['days'] if day < cutoff]:
+            del self.stats['days'][day]
+
+    def summarize(self, days=7):
+        """Сводит дневные агрегаты за последние `days` дней в одну статистику."""
+        moment = self.now()
+        window = {(moment - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days)}
+
+        summary = {
+            'total': 0,
+            'by_operator': {},
+            'by_language': {},
+            'wait_histogram': [0] * (len(WAIT_BUCKETS) + 1),
+            'wait_max': 0
+        }
+        with self.lock:
+            for day in window:
+                day_stats = self.stats['days'].get(day)
+                if not day_stats:
+                    continue
+                summary['total'] += day_stats['total']
+                for user_id, operator in day_stats['by_operator'].items():
+                    merged = summary['by_operator'].setdefault(user_id, {'display_name': operator['display_name'], 'count': 0})
+                    merged['count'] += operator['count']
+                for language, count in day_stats['by_language'].items():
+                    summary['by_language'][language] = summary['by_language'].get(language, 0) + count
+                for i, count in enumerate(day_stats['wait_histogram']):
+                    summary['wait_histogram'][i] += count
+                summary['wait_max'] = max(summary['wait_max'], day_stats['wait_max'])
+
+        summary['wait_median'] = self.percentile(summary, 0.5)
+        summary['wait_p95'] = self.percentile(summary, 0.95)
+        return summary
+
+    def percentile(self, summary, fraction):
+        """Оценивает перцентиль времени ожидания по гистограмме.
+
+        Внутри корзины значение интерполируется линейно между её нижней и верхней границей.
+        """
+        total = sum(summary['wait_histogram'])
+        if not total:
+            return None
+        rank = max(1, math.ceil(fraction * total))
+        cumulative = 0
+        for i, count in enumerate(summary['wait_histogram']):
+            if cumulative + count >= rank:
+                lower = WAIT_BUCKETS[i - 1] if i > 0 else 0
+                upper = WAIT_BUCKETS[i] if i < len(WAIT_BUCKETS) else summary['wait_max']
+                upper = min(upper, summary['wait_max'])
+                lower = min(lower, upper)
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return summary['wait_max']
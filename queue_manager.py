@@ -1,11 +1,39 @@
 import json
+import logging
+import threading
+
+# Языки, которые можно выбрать при регистрации
+SUPPORTED_LANGUAGES = ['RU', 'UA', 'EN', 'KA', 'TR', 'PL', 'ES', 'PT']
+
+def normalize_display_name(display_name):
+    return (display_name or '').strip().casefold()
 
 class QueueManager:
     def __init__(self):
         self.queue_file = 'queue.json'
         self.register_file = 'register.json'
+        # Очередь меняют и потоки Flask, и планировщик смен
+        self.lock = threading.RLock()
         self.queue = self.load_queue()
         self.registered_users = self.load_registered_users()
+        self.rebuild_indexes()
+
+    def rebuild_indexes(self):
+        """Строит индексы по user_id и нормализованному display_name, а также индекс очереди."""
+        self.users_by_id = {}
+        self.users_by_name = {}
+        for user in self.registered_users:
+            self.users_by_id.setdefault(user['user_id'], user)
+            normalized = normalize_display_name(user['display_name'])
+            existing = self.users_by_name.setdefault(normalized, user)
+            if existing is not user:
+                # Имя уже занято (например, данные до введения проверки уникальности):
+                # поиск по имени вернёт первого пользователя, коллизию нужно исправить вручную
+                logging.warning(
+                    f"Ambiguous display name '{user['display_name']}': used by {existing['user_id']} and {user['user_id']}. "
+                    f"Name lookups resolve to {existing['user_id']}; rename or delete one of them."
+                )
+        self.queue_by_id = {user['user_id']: user for user in self.queue}
 
     def load_queue(self):
         try:
@@ -30,82 +58,199 @@ class QueueManager:
             json.dump(self.registered_users, f, indent=4)
 
     def is_user_registered(self, user_id):
-        return any(user['user_id'] == user_id for user in self.registered_users)
+        return user_id in self.users_by_id
 
     def get_user_by_display_name(self, display_name):
-        for user in self.registered_users:
-            if user['display_name'] == display_name:
-                return user
-        return None
+        return self.users_by_name.get(normalize_display_name(display_name))
+
+    def is_display_name_taken(self, display_name, user_id=None):
+        """Проверяет, занято ли отображаемое имя другим зарегистрированным пользователем."""
+        user = self.get_user_by_display_name(display_name)
+        return user is not None and user['user_id'] != user_id
 
     def update_user_languages(self, display_name, new_languages):
-        for user in self.registered_users:
-            if user['display_name'] == display_name:
-                user['languages'] = new_languages
-                self.save_registered_users()
-                return True
-        return False
+        with self.lock:
+            user = self.get_user_by_display_name(display_name)
+            if not user:
+                return False
+            user['languages'] = new_languages
+            self.save_registered_users()
+            return True
 
     def delete_registered_user(self, display_name):
-        self.registered_users = [user for user in self.registered_users if user['display_name'] != display_name]
-        self.save_registered_users()
+        with self.lock:
+            user = self.get_user_by_display_name(display_name)
+            if not user:
+                return
+            self.registered_users.remove(user)
+            self.users_by_id.pop(user['user_id'], None)
+            normalized = normalize_display_name(display_name)
+            if self.users_by_name.get(normalized) is user:
+                # Если имя было занято несколькими пользователями, индекс переходит к оставшемуся
+                remaining = next((other for other in self.registered_users if normalize_display_name(other['display_name']) == normalized), None)
+                if remaining:
+                    self.users_by_name[normalized] = remaining
+                else:
+                    del self.users_by_name[normalized]
+            self.save_registered_users()
 
     def register_user(self, user_id, languages, display_name):
-        self.registered_users.append({
-            'user_id': user_id,
-            'display_name': display_name,
-            'languages': languages
-        })
-        self.save_registered_users()
+        """Регистрирует пользователя. Возвращает False, если он уже зарегистрирован или имя занято."""
+        with self.lock:
+            if self.is_user_registered(user_id) or self.is_display_name_taken(display_name, user_id):
+                return False
+            user = {
+                'user_id': user_id,
+                'display_name': display_name,
+                'languages': languages
+            }
+            self.registered_users.append(user)
+            self.users_by_id[user_id] = user
+            self.users_by_name[normalize_display_name(display_name)] = user
+            self.save_registered_users()
+            return True
+
+    def bulk_upsert_users(self, users, replace=False):
+        """Добавляет или обновляет пользователей одной записью в register.json.
+
+        При replace=True список зарегистрированных пользователей полностью заменяется,
+        а операторы, которых нет в новом ростере, убираются из очереди.
+        Отображаемые имена в очереди синхронизируются с новыми данными.
+        """
+        with self.lock:
+            existing = {user['user_id']: user for user in self.registered_users}
+            by_user_id = {} if replace else dict(existing)
+            for user in users:
+                # Сохраняем остальные поля (например, расписание смен) существующих пользователей
+                by_user_id[user['user_id']] = dict(existing.get(user['user_id'], {}), **{
+                    'user_id': user['user_id'],
+                    'display_name': user['display_name'],
+                    'languages': user['languages']
+                })
+            self.registered_users = list(by_user_id.values())
+            self.rebuild_indexes()
+            self.save_registered_users()
+
+            queue_changed = False
+            if replace:
+                kept = [item for item in self.queue if item['user_id'] in by_user_id]
+                if len(kept) != len(self.queue):
+                    self.queue = kept
+                    self.queue_by_id = {item['user_id']: item for item in self.queue}
+                    queue_changed = True
+            for item in self.queue:
+                registered_user = by_user_id.get(item['user_id'])
+                if registered_user and registered_user['display_name'] != item['display_name']:
+                    item['display_name'] = registered_user['display_name']
+                    queue_changed = True
+            if queue_changed:
+                self.save_queue()
+
+    def set_user_shifts(self, user_id, shifts):
+        with self.lock:
+            user = self.users_by_id.get(user_id)
+            if not user:
+                return False
+            if shifts:
+                user['shifts'] = shifts
+            else:
+                user.pop('shifts', None)
+            self.save_registered_users()
+            return True
 
     def is_user_in_queue(self, user_id):
-        return any(user['user_id'] == user_id for user in self.queue)
+        return user_id in self.queue_by_id
 
     def add_user_to_queue(self, user_id, display_name, paused=False):
-        if not self.is_user_in_queue(user_id):
-            self.queue.append({
-                'user_id': user_id,
-                'display_name': display_name,
-                'paused': paused
-            })
-            self.save_queue()
+        with self.lock:
+            if not self.is_user_in_queue(user_id):
+                user = {
+                    'user_id': user_id,
+                    'display_name': display_name,
+                    'paused': paused
+                }
+                self.queue.append(user)
+                self.queue_by_id[user_id] = user
+                self.save_queue()
 
     def remove_user_from_queue(self, user_id):
-        self.queue = [user for user in self.queue if user['user_id'] != user_id]
-        self.save_queue()
+        with self.lock:
+            user = self.queue_by_id.pop(user_id, None)
+            if user:
+                self.queue.remove(user)
+            self.save_queue()
 
     def pause_user(self, user_id):
-        for user in self.queue:
-            if user['user_id'] == user_id:
+        with self.lock:
+            user = self.queue_by_id.get(user_id)
+            if user:
                 user['paused'] = True
                 self.save_queue()
-                break
 
     def resume_user(self, user_id):
-        for user in self.queue:
-            if user['user_id'] == user_id:
+        with self.lock:
+            user = self.queue_by_id.get(user_id)
+            if user:
                 user['paused'] = False
                 self.save_queue()
-                break
 
     def move_user_to_top(self, user_id):
-        user = next((user for user in self.queue if user['user_id'] == user_id), None)
-        if user:
-            self.queue.remove(user)
-            self.queue.insert(0, user)
-            self.save_queue()
+        with self.lock:
+            user = self.queue_by_id.get(user_id)
+            if user:
+                self.queue.remove(user)
+                self.queue.insert(0, user)
+                self.save_queue()
+
+    def apply_queue_changes(self, changes):
+        """Применяет пакет изменений очереди одной записью в queue.json.
+
+        changes — пары (action, user_id), где action: add, pause, resume или remove.
+        Возвращает изменения, которые действительно поменяли очередь.
+        """
+        with self.lock:
+            applied = []
+            removed = False
+            for action, user_id in changes:
+                user = self.queue_by_id.get(user_id)
+                if action == 'add':
+                    registered_user = self.users_by_id.get(user_id)
+                    if not registered_user:
+                        continue
+                    if not user:
+                        user = {'user_id': user_id, 'display_name': registered_user['display_name'], 'paused': False}
+                        self.queue.append(user)
+                        self.queue_by_id[user_id] = user
+                    elif user['paused']:
+                        user['paused'] = False
+                    else:
+                        continue
+                elif action in ('pause', 'resume') and user and user['paused'] != (action == 'pause'):
+                    user['paused'] = action == 'pause'
+                elif action == 'remove' and user:
+                    del self.queue_by_id[user_id]
+                    removed = True
+                else:
+                    continue
+                applied.append((action, user_id))
+
+            if removed:
+                self.queue = [user for user in self.queue if self.queue_by_id.get(user['user_id']) is user]
+            if applied:
+                self.save_queue()
+            return applied
 
     def list_queue(self):
         return self.queue
 
     def get_user_languages(self, user_id):
-        user = next((user for user in self.registered_users if user['user_id'] == user_id), None)
+        user = self.users_by_id.get(user_id)
         return user['languages'] if user else []
 
     def get_first_user_by_language(self, language):
         for user in self.queue:
             if not user['paused']:
-                registered_user = self.get_user_by_display_name(user['display_name'])
+                registered_user = self.users_by_id.get(user['user_id'])
                 if registered_user and language in registered_user['languages']:
                     return user
         return None
@@ -115,7 +260,7 @@ class QueueManager:
         return user['user_id'] if user else None
 
     def get_display_name(self, user_id):
-        user = next((user for user in self.registered_users if user['user_id'] == user_id), None)
+        user = self.users_by_id.get(user_id)
         return user['display_name'] if user else None
     
     def get_first_user(self):
@@ -0,0 +1,270 @@
+import os
+import csv
+import sys
+import json
+import argparse
+import urllib.error
+import urllib.request
+from queue_manager import QueueManager, SUPPORTED_LANGUAGES, normalize_display_name
+
+ROSTER_FIELDS = ['user_id', 'display_name', 'languages']
+ROSTER_FORMATS = ('csv', 'jsonl')
+# Эндпоинт запущенного приложения, через который CLI импортирует ростер
+ROSTER_API_URL = os.getenv('ROSTER_API_URL', 'http://localhost:5000/roster')
+
+
+def parse_languages(value):
+    """Разбирает список языков из строки ("RU;EN" или "RU, EN") или списка строк."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        items = value
+    elif isinstance(value, str):
+        items = value.replace(',', ';').split(';')
+    else:
+        raise ValueError('languages must be a string or a list of strings')
+    if not all(isinstance(item, str) for item in items):
+        raise ValueError('languages must be a string or a list of strings')
+    return [item.strip().upper() for item in items if item.strip()]
+
+
+def read_roster(stream, fmt):
+    """Построчно читает записи ростера из потока. Возвращает пары (номер строки, запись)."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, {'_error': f'invalid JSON: {e.msg}'}
+    else:
+        raise ValueError(f"Unsupported roster format: {fmt}")
+
+
+def validate_roster(records):
+    """Проверяет записи ростера за один проход. Возвращает (users, errors)."""
+    users = []
+    errors = []
+    seen_user_ids = set()
+    seen_display_names = set()
+
+    for line_number, record in records:
+        if not isinstance(record, dict):
+            errors.append(f'line {line_number}: expected an object')
+            continue
+        if '_error' in record:
+            errors.append(f'line {line_number}: {record["_error"]}')
+            continue
+
+        invalid = [field for field in ('user_id', 'display_name') if not isinstance(record.get(field) or '', str)]
+        if invalid:
+            errors.append(f'line {line_number}: {", ".join(invalid)} must be a string')
+            continue
+        try:
+            languages = parse_languages(record.get('languages'))
+        except ValueError as e:
+            errors.append(f'line {line_number}: {e}')
+            continue
+
+        user_id = (record.get('user_id') or '').strip()
+        display_name = (record.get('display_name') or '').strip()
+
+        if not user_id:
+            errors.append(f'line {line_number}: user_id is required')
+            continue
+        if user_id in seen_user_ids:
+            errors.append(f'line {line_number}: duplicate user_id {user_id}')
+            continue
+        if not languages:
+            errors.append(f'line {line_number}: at least one language is required')
+            continue
+        unsupported = [lang for lang in languages if lang not in SUPPORTED_LANGUAGES]
+        if unsupported:
+            errors.append(f'line {line_number}: unsupported language(s) {", ".join(unsupported)}')
+            continue
+        if display_name:
+            normalized = normalize_display_name(display_name)
+            if normalized in seen_display_names:
+                errors.append(f'line {line_number}: duplicate display_name {display_name}')
+                continue
+            seen_display_names.add(normalized)
+
+        seen_user_ids.add(user_id)
+        users.append({'user_id': user_id, 'display_name': display_name, 'languages': languages})
+
+    return users, errors
+
+
+def resolve_display_names(client, user_ids):
+    """Получает отображаемые имена одним постраничным проходом users_list."""
+    user_ids = set(user_ids)
+    display_names = {}
+    cursor = None
+    while True:
+        response = client.users_list(cursor=cursor, limit=200) if cursor else client.users_list(limit=200)
+        for member in response['members']:
+            if member['id'] in user_ids:
+                profile = member.get('profile', {})
+                display_names[member['id']] = profile.get('display_name') or profile.get('real_name') or member.get('name')
+        cursor = response.get('response_metadata', {}).get('next_cursor')
+        if not cursor or len(display_names) == len(user_ids):
+            return display_names
+
+
+def import_roster(queue_manager, stream, fmt, client=None, replace=False):
+    """Импортирует ростер из потока. Ничего не записывает, если есть ошибки.
+
+    Возвращает (количество импортированных пользователей, список ошибок).
+    """
+    users, errors = validate_roster(read_roster(stream, fmt))
+    if errors:
+        return 0, errors
+
+    missing = [user['user_id'] for user in users if not user['display_name']]
+    if missing:
+        if client is None:
+            return 0, [f'display_name is missing for {len(missing)} user(s) and no Slack client is available']
+        try:
+            display_names = resolve_display_names(client, missing)
+        except Exception as e:
+            return 0, [f'failed to fetch display names from Slack: {e}']
+        for user in users:
+            if not user['display_name']:
+                user['display_name'] = display_names.get(user['user_id'], '')
+        unresolved = [user['user_id'] for user in users if not user['display_name']]
+        if unresolved:
+            return 0, [f'could not resolve display_name for: {", ".join(unresolved)}']
+
+    # Отображаемые имена должны однозначно определять оператора
+    imported_ids = {user['user_id'] for user in users}
+    taken = {} if replace else {
+        normalize_display_name(user['display_name']): user['user_id']
+        for user in queue_manager.registered_users if user['user_id'] not in imported_ids
+    }
+    for user in users:
+        normalized = normalize_display_name(user['display_name'])
+        if taken.get(normalized, user['user_id']) != user['user_id']:
+            errors.append(f'display_name {user["display_name"]} of {user["user_id"]} is already used by {taken[normalized]}')
+        taken[normalized] = user['user_id']
+    if errors:
+        return 0, errors
+
+    queue_manager.bulk_upsert_users(users, replace=replace)
+    return len(users), []
+
+
+def import_roster_via_api(path, fmt, replace=False):
+    """Импортирует ростер через эндпоинт /roster запущенного приложения.
+
+    Возвращает (количество, ошибки) или None, если приложение не запущено.
+    """
+    url = f"{ROSTER_API_URL}?format={fmt}" + ('&replace=1' if replace else '')
+    with open(path, 'rb') as f:
+        request = urllib.request.Request(url, data=f.read(), method='POST', headers={
+            'Authorization': f"Bearer {os.getenv('ADMIN_API_TOKEN', '')}",
+            'Content-Type': 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        })
+    try:
+        with urllib.request.urlopen(request) as response:
+            result = json.load(response)
+    except urllib.error.HTTPError as e:
+        if e.code == 403:
+            return 0, ['roster endpoint returned HTTP 403; check ADMIN_API_TOKEN']
+        try:
+            result = json.load(e)
+        except ValueError:
+            result = {}
+        if 'errors' not in result:
+            return 0, [f'roster endpoint returned HTTP {e.code}']
+    except urllib.error.URLError as e:
+        if isinstance(e.reason, ConnectionRefusedError):
+            return None
+        raise
+    return result.get('imported', 0), result.get('errors', [])
+
+
+def export_roster(users, fmt, out):
+    """Записывает ростер в поток в формате csv или jsonl."""
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=ROSTER_FIELDS)
+        writer.writeheader()
+        for user in users:
+            writer.writerow({'user_id': user['user_id'], 'display_name': user['display_name'], 'languages': ';'.join(user['languages'])})
+    elif fmt == 'jsonl':
+        for user in users:
+            out.write(json.dumps({field: user[field] for field in ROSTER_FIELDS}, ensure_ascii=False) + '\n')
+    else:
+        raise ValueError(f"Unsupported roster format: {fmt}")
+
+
+def export_language_matrix(users, out):
+    """Записывает матрицу операторов и языков в CSV (1 — оператор знает язык)."""
+    writer = csv.writer(out)
+    writer.writerow(['user_id', 'display_name'] + SUPPORTED_LANGUAGES)
+    for user in users:
+        writer.writerow([user['user_id'], user['display_name']] + [1 if lang in user['languages'] else 0 for lang in SUPPORTED_LANGUAGES])
+    writer.writerow(['', 'TOTAL'] + [sum(1 for user in users if lang in user['languages']) for lang in SUPPORTED_LANGUAGES])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import and export the operator roster.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Export the roster.')
+    export_parser.add_argument('--format', choices=ROSTER_FORMATS, default='csv')
+    export_parser.add_argument('--output', help='Output file (stdout by default).')
+
+    import_parser = subparsers.add_parser('import', help='Import the roster (through ROSTER_API_URL if the app is running).')
+    import_parser.add_argument('file', help='Roster file.')
+    import_parser.add_argument('--format', choices=ROSTER_FORMATS, help='Defaults to the file extension.')
+    import_parser.add_argument('--replace', action='store_true', help='Replace the whole roster instead of merging.')
+
+    matrix_parser = subparsers.add_parser('matrix', help='Export the language matrix as CSV.')
+    matrix_parser.add_argument('--output', help='Output file (stdout by default).')
+
+    args = parser.parse_args()
+    queue_manager = QueueManager()
+
+    if args.command == 'import':
+        fmt = args.format or os.path.splitext(args.file)[1].lstrip('.').lower()
+        if fmt not in ROSTER_FORMATS:
+            parser.error('Cannot detect the roster format, use --format.')
+
+        # Если приложение запущено, импортируем через него: иначе его состояние в памяти
+        # разойдётся с register.json и следующая запись приложения затрёт импорт
+        result = import_roster_via_api(args.file, fmt, replace=args.replace)
+        if result is None:
+            client = None
+            if os.getenv('SLACK_BOT_TOKEN'):
+                from slack_sdk import WebClient
+                client = WebClient(token=os.getenv('SLACK_BOT_TOKEN'))
+
+            with open(args.file, 'r', newline='', encoding='utf-8') as f:
+                result = import_roster(queue_manager, f, fmt, client=client, replace=args.replace)
+        imported, errors = result
+        if errors:
+            print('\n'.join(errors), file=sys.stderr)
+            sys.exit(1)
+        print(f"Imported {imported} operator(s).")
+        return
+
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.command == 'export':
+            export_roster(queue_manager.registered_users, args.format, out)
+        else:
+            export_language_matrix(queue_manager.registered_users, out)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv()
+    main()
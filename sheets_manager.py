@@ -1,13 +1,23 @@
 import threading
+import fcntl
+import json
+import time
+import uuid
+from contextlib import contextmanager
 import gspread
 from google.oauth2.service_account import Credentials
 from dotenv import load_dotenv
 import os
 import logging
+from admission import CircuitBreaker
 
 # Загрузка переменных окружения из .env файла
 load_dotenv()
 
+# Таймаут запросов к Google (в секундах). Должен быть заметно меньше min_age в backfill,
+# чтобы зависшая фоновая запись не пересеклась с дозаписью той же строки.
+SHEETS_REQUEST_TIMEOUT = 20
+
 class SheetsManager:
     def __init__(self):
         # Получение идентификатора таблицы из переменной окружения
@@ -26,8 +36,57 @@ class SheetsManager:
         # Создайте учетные данные с необходимыми скопами
         creds = Credentials.from_service_account_file(creds_file, scopes=scopes)
         self.client = gspread.authorize(creds)
+        self.client.set_timeout(SHEETS_REQUEST_TIMEOUT)
         self.sheet = self.client.open_by_key(spreadsheet_id).sheet1
 
+        # Локальный журнал строк, которые ещё не записаны в таблицу
+        self.pending_file = 'pending_rows.json'
+        self.journal_lock_file = 'pending_rows.json.lock'
+        self.backfill_lock_file = 'pending_rows.lock'
+        self.pending_lock = threading.Lock()
+        # Ключи строк, которые сейчас записываются фоновыми потоками этого процесса
+        self.writing_keys = set()
+
+        # При недоступном Google запросы сразу отклоняются, строки остаются в журнале
+        self.breaker = CircuitBreaker('Google Sheets')
+
+    def load_pending_rows(self):
+        try:
+            with open(self.pending_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_pending_rows(self, pending_rows):
+        # Пишем во временный файл и атомарно подменяем, чтобы журнал не повредился при сбое
+        tmp_file = f"{self.pending_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(pending_rows, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, self.pending_file)
+
+    @contextmanager
+    def journal_lock(self):
+        """Блокирует журнал и для потоков этого процесса, и для других процессов (backfill.py)."""
+        with self.pending_lock, open(self.journal_lock_file, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def add_pending_row(self, row_key, row):
+        with self.journal_lock():
+            pending_rows = self.load_pending_rows()
+            pending_rows[row_key] = {'row': row, 'queued_at': time.time()}
+            self.save_pending_rows(pending_rows)
+
+    def remove_pending_rows(self, row_keys):
+        with self.journal_lock():
+            pending_rows = self.load_pending_rows()
+            for row_key in row_keys:
+                pending_rows.pop(row_key, None)
+            self.save_pending_rows(pending_rows)
+
     def find_empty_row(self):
         """Находит первую пустую строку в Google Sheet."""
         all_values = self.sheet.get_all_values()
@@ -43,27 +102,91 @@ class SheetsManager:
 
         return row_index
 
-    def add_task_to_sheet(self, timestamp, message, language, display_name):
-        """Добавляет задачу в Google Sheet с данными."""
+    def add_task_to_sheet(self, timestamp, message, language, display_name, row_key=''):
+        """Добавляет задачу в Google Sheet с данными. row_key пишется в столбец F как ключ идемпотентности."""
         try:
             # Находим первую пустую строку
             row_index = self.find_empty_row()
 
             # Добавляем данные в найденную пустую строку
-            self.sheet.insert_row([timestamp, '', message, language, display_name], index=row_index)
+            self.sheet.insert_row([timestamp, '', message, language, display_name, row_key], index=row_index)
         
         except Exception as e:
             raise Exception(f"Error adding task to sheet: {e}")
 
     def add_task_to_sheet_async(self, timestamp, message, language, display_name):
-        """Запускает добавление задачи в Google Sheet в фоновом режиме."""
-        
+        """Запускает добавление задачи в Google Sheet в фоновом режиме.
+
+        Строка сначала сохраняется в локальный журнал и удаляется из него только после
+        успешной записи, поэтому при сбое её дозапишет backfill_pending_rows.
+        """
+        row_key = uuid.uuid4().hex
+        self.add_pending_row(row_key, [timestamp, '', message, language, display_name, row_key])
+        self.writing_keys.add(row_key)
+
         def task():
             try:
-                self.add_task_to_sheet(timestamp, message, language, display_name)
+                self.breaker.call(self.add_task_to_sheet, timestamp, message, language, display_name, row_key)
+                self.remove_pending_rows([row_key])
             except Exception as e:
-                logging.error(f"Failed to add task to Google Sheet: {e}")
+                logging.error(f"Failed to add task to Google Sheet, row kept for backfill: {e}")
+            finally:
+                self.writing_keys.discard(row_key)
 
         # Запуск в отдельном потоке
         thread = threading.Thread(target=task)
         thread.start()
+
+    def backfill_pending_rows(self, batch_size=500, min_age=60):
+        """Дозаписывает в таблицу строки из локального журнала.
+
+        Из таблицы одним запросом читается столбец F с ключами; строки, чей ключ там уже
+        есть, просто удаляются из журнала, остальные добавляются пачками по batch_size.
+        Строки, которые ещё записываются в этом процессе, и строки моложе min_age секунд
+        (запись из другого процесса, ограниченная SHEETS_REQUEST_TIMEOUT) пропускаются.
+        Возвращает количество дозаписанных строк.
+        """
+        with open(self.backfill_lock_file, 'w') as lock:
+            try:
+                # Межпроцессная блокировка: одновременно работает только один backfill
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logging.info("Sheets backfill is already running, skipping.")
+                return 0
+
+            now = time.time()
+            pending_rows = {
+                row_key: entry for row_key, entry in self.load_pending_rows().items()
+                if now - entry['queued_at'] >= min_age and row_key not in self.writing_keys
+            }
+            if not pending_rows:
+                return 0
+
+            existing_keys = {key for key in self.breaker.call(self.sheet.col_values, 6) if key}
+            already_written = [row_key for row_key in pending_rows if row_key in existing_keys]
+            if already_written:
+                self.remove_pending_rows(already_written)
+
+            missing = [(row_key, entry['row']) for row_key, entry in sorted(pending_rows.items(), key=lambda item: item[1]['queued_at']) if row_key not in existing_keys]
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                self.breaker.call(self.sheet.append_rows, [row for _, row in batch], table_range='A1')
+                self.remove_pending_rows([row_key for row_key, _ in batch])
+
+            return len(missing)
+
+    def start_backfill_loop(self, interval=300):
+        """Запускает периодический backfill в фоновом потоке."""
+
+        def loop():
+            while True:
+                try:
+                    written = self.backfill_pending_rows()
+                    if written:
+                        logging.info(f"Backfilled {written} row(s) to Google Sheet.")
+                except Exception as e:
+                    logging.error(f"Failed to backfill Google Sheet: {e}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
@@ -0,0 +1,212 @@
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+import pytz
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+# Границы смены и действие с очередью на каждой из них
+BOUNDARY_ACTIONS = {
+    'start': 'add',
+    'pause_start': 'pause',
+    'pause_end': 'resume',
+    'end': 'remove'
+}
+
+
+def parse_days(value):
+    """Разбирает дни недели: "daily", "mon-fri", "mon,wed,fri" или их сочетание."""
+    value = value.strip().lower()
+    if value == 'daily':
+        return list(range(7))
+
+    days = set()
+    for part in value.split(','):
+        if '-' in part:
+            first, last = part.split('-', 1)
+            if first not in WEEKDAYS or last not in WEEKDAYS:
+                raise ValueError(f"Unknown day range: {part}")
+            day, end = WEEKDAYS.index(first), WEEKDAYS.index(last)
+            days.add(day)
+            # Диапазон может переходить через воскресенье (например, fri-mon)
+            while day != end:
+                day = (day + 1) % 7
+                days.add(day)
+        elif part in WEEKDAYS:
+            days.add(WEEKDAYS.index(part))
+        else:
+            raise ValueError(f"Unknown day: {part}")
+    return sorted(days)
+
+
+def parse_time_range(value):
+    """Разбирает интервал "HH:MM-HH:MM". Возвращает пару строк (start, end)."""
+    try:
+        start, end = value.split('-', 1)
+        start = datetime.strptime(start.strip(), '%H:%M').strftime('%H:%M')
+        end = datetime.strptime(end.strip(), '%H:%M').strftime('%H:%M')
+    except ValueError:
+        raise ValueError(f"Invalid time range: {value}. Use HH:MM-HH:MM.")
+    if start == end:
+        raise ValueError(f"Invalid time range: {value}. Start and end must differ.")
+    return start, end
+
+
+def minutes_from_start(shift, value):
+    """Сколько минут прошло от начала смены до времени value (с учётом перехода через полночь)."""
+    start = datetime.strptime(shift['start'], '%H:%M')
+    moment = datetime.strptime(value, '%H:%M')
+    return int((moment - start).total_seconds() // 60) % (24 * 60)
+
+
+def validate_pause(shift):
+    """Проверяет, что перерыв целиком лежит внутри смены."""
+    pause_start = minutes_from_start(shift, shift['pause_start'])
+    pause_end = minutes_from_start(shift, shift['pause_end'])
+    if not 0 < pause_start < pause_end <= minutes_from_start(shift, shift['end']):
+        raise ValueError(f"Pause {shift['pause_start']}-{shift['pause_end']} must be within the shift {shift['start']}-{shift['end']}.")
+
+
+def format_shift(shift):
+    days = ','.join(WEEKDAYS[day] for day in shift['days'])
+    text = f"{days} {shift['start']}-{shift['end']}"
+    if shift.get('pause_start'):
+        text += f" (pause {shift['pause_start']}-{shift['pause_end']})"
+    return text
+
+
+class ShiftScheduler:
+    """Добавляет, ставит на паузу и убирает операторов из очереди по расписанию смен.
+
+    Ближайшие границы смен хранятся в куче. Все границы, наступившие одновременно,
+    применяются одной записью очереди и одним общим объявлением в канале.
+    Время смен задаётся по Киеву.
+    """
+
+    def __init__(self, queue_manager, announce):
+        self.queue_manager = queue_manager
+        self.announce = announce
+        self.timezone = pytz.timezone('Europe/Kyiv')
+        self.condition = threading.Condition()
+        self.heap = []
+        self.sequence = 0
+
+    def occurrences(self, shift, boundary, around, offsets):
+        """Моменты границы смены в днях around + offset (в порядке offsets)."""
+        time_value = datetime.strptime(shift[boundary], '%H:%M').time()
+        # Границы после полуночи (ночная смена) относятся к следующему дню
+        day_offset = 1 if boundary != 'start' and shift[boundary] < shift['start'] else 0
+        around_local = around.astimezone(self.timezone)
+        for offset in offsets:
+            date = around_local.date() + timedelta(days=offset)
+            if (date.weekday() - day_offset) % 7 in shift['days']:
+                yield self.timezone.localize(datetime.combine(date, time_value))
+
+    def next_occurrence(self, shift, boundary, after):
+        """Ближайший момент границы смены строго после `after`."""
+        return next((moment for moment in self.occurrences(shift, boundary, after, range(-1, 9)) if moment > after), None)
+
+    def last_occurrence(self, shift, boundary, before):
+        """Последний момент границы смены не позже `before`."""
+        return next((moment for moment in self.occurrences(shift, boundary, before, range(1, -9, -1)) if moment <= before), None)
+
+    def is_active(self, shift, start, end, now):
+        """Идёт ли сейчас интервал между границами start и end смены."""
+        last_start = self.last_occurrence(shift, start, now)
+        last_end = self.last_occurrence(shift, end, now)
+        return last_start is not None and (last_end is None or last_end < last_start)
+
+    def active_changes(self, user_ids=None):
+        """Изменения очереди, приводящие её в соответствие с идущими сейчас сменами.
+
+        Операторов в активной смене, которых нет в очереди, добавляет, а тех, у кого
+        сейчас перерыв, ставит на паузу. Операторов вне смены не трогает.
+        """
+        now = datetime.now(self.timezone)
+        changes = []
+        for user in self.queue_manager.registered_users:
+            if user_ids is not None and user['user_id'] not in user_ids:
+                continue
+            active = [shift for shift in user.get('shifts', []) if self.is_active(shift, 'start', 'end', now)]
+            if not active:
+                continue
+            if not self.queue_manager.is_user_in_queue(user['user_id']):
+                changes.append(('add', user['user_id']))
+            if any(shift.get('pause_start') and self.is_active(shift, 'pause_start', 'pause_end', now) for shift in active):
+                changes.append(('pause', user['user_id']))
+        return changes
+
+    def apply_active_shifts(self, user_ids=None):
+        """Применяет идущие сейчас смены одним пакетом (при запуске или после добавления смены)."""
+        changes = self.active_changes(user_ids)
+        if not changes:
+            return
+        try:
+            applied = self.queue_manager.apply_queue_changes(changes)
+            if applied:
+                self.announce(self.format_announcement(applied))
+        except Exception as e:
+            logging.error(f"Failed to apply shift changes: {e}")
+
+    def push(self, moment, user_id, shift, boundary):
+        if moment is None:
+            return
+        self.sequence += 1
+        heapq.heappush(self.heap, (moment, self.sequence, user_id, shift, boundary))
+
+    def reschedule(self):
+        """Перестраивает кучу по текущему реестру. Вызывать после изменения расписаний."""
+        now = datetime.now(self.timezone)
+        with self.condition:
+            self.heap = []
+            for user in self.queue_manager.registered_users:
+                for shift in user.get('shifts', []):
+                    for boundary in BOUNDARY_ACTIONS:
+                        if shift.get(boundary):
+                            self.push(self.next_occurrence(shift, boundary, now), user['user_id'], shift, boundary)
+            self.condition.notify()
+
+    def pop_due(self, now):
+        """Забирает все наступившие границы и ставит их следующие повторения."""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            moment, _, user_id, shift, boundary = heapq.heappop(self.heap)
+            due.append((moment, user_id, boundary))
+            self.push(self.next_occurrence(shift, boundary, moment), user_id, shift, boundary)
+        # Порядок внутри пакета: по времени, затем конец смены раньше начала следующей
+        order = ['end', 'pause_start', 'pause_end', 'start']
+        due.sort(key=lambda item: (item[0], order.index(item[2])))
+        return [(BOUNDARY_ACTIONS[boundary], user_id) for _, user_id, boundary in due]
+
+    def run(self):
+        while True:
+            with self.condition:
+                now = datetime.now(self.timezone)
+                changes = self.pop_due(now)
+                if not changes:
+                    timeout = (self.heap[0][0] - now).total_seconds() if self.heap else None
+                    self.condition.wait(timeout)
+                    continue
+
+            try:
+                applied = self.queue_manager.apply_queue_changes(changes)
+                if applied:
+                    self.announce(self.format_announcement(applied))
+            except Exception as e:
+                logging.error(f"Failed to apply shift changes: {e}")
+
+    def format_announcement(self, applied):
+        labels = {'add': 'added to the queue', 'pause': 'paused', 'resume': 'resumed', 'remove': 'removed from the queue'}
+        parts = []
+        for action, label in labels.items():
+            user_ids = [user_id for applied_action, user_id in applied if applied_action == action]
+            if user_ids:
+                parts.append(f"{', '.join(f'<@{user_id}>' for user_id in user_ids)} {label}")
+        return f"Shift change: {'; '.join(parts)}."
+
+    def start(self):
+        self.reschedule()
+        self.apply_active_shifts()
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
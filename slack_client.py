@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from admission import CircuitBreaker
+
+# Ошибки Slack API, которые означают проблему на стороне Slack, а не в запросе
+TRANSIENT_SLACK_ERRORS = ('ratelimited', 'service_unavailable', 'internal_error', 'fatal_error', 'request_timeout')
+
+
+def is_slack_failure(e):
+    if isinstance(e, SlackApiError):
+        return e.response.get('error') in TRANSIENT_SLACK_ERRORS
+    return True
+
+
+class SlackClient:
+    """Клиент Slack с опциональным асинхронным режимом.
+
+    В обычном режиме вызовы идут через синхронный WebClient. В асинхронном режиме
+    используется AsyncWebClient на общем пуле keep-alive соединений aiohttp, который
+    работает в отдельном потоке с event loop; потоки Flask только ждут результат,
+    а независимые вызовы можно отправлять одновременно через submit.
+    Методы Slack API доступны как атрибуты: client.chat_postMessage(...).
+    Все вызовы проходят через circuit breaker: при недоступном Slack они сразу
+    завершаются SlackApiError с ошибкой circuit_open.
+    """
+
+    def __init__(self, token, async_mode=False, pool_size=100, timeout=30):
+        self.token = token
+        self.async_mode = async_mode
+        self.timeout = timeout
+        self.breaker = CircuitBreaker('Slack', is_failure=is_slack_failure)
+
+        if async_mode:
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.thread.start()
+            self.client = asyncio.run_coroutine_threadsafe(self.create_async_client(pool_size), self.loop).result()
+        else:
+            self.client = WebClient(token=token, timeout=timeout)
+
+    async def create_async_client(self, pool_size):
+        # aiohttp нужен только в асинхронном режиме
+        import aiohttp
+        from slack_sdk.web.async_client import AsyncWebClient
+
+        connector = aiohttp.TCPConnector(limit=pool_size, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(connector=connector)
+        return AsyncWebClient(token=self.token, session=self.session, timeout=self.timeout)
+
+    def submit(self, method, **kwargs):
+        """Отправляет вызов Slack API и сразу возвращает Future с ответом."""
+        if not self.breaker.allow():
+            future = Future()
+            future.set_exception(SlackApiError('Slack circuit breaker is open', {'ok': False, 'error': 'circuit_open'}))
+            return future
+
+        if self.async_mode:
+            future = asyncio.run_coroutine_threadsafe(getattr(self.client, method)(**kwargs), self.loop)
+        else:
+            future = Future()
+            try:
+                future.set_result(getattr(self.client, method)(**kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+        future.add_done_callback(self.record_outcome)
+        return future
+
+    def record_outcome(self, future):
+        error = future.exception()
+        if error:
+            self.breaker.record_failure(error)
+        else:
+            self.breaker.record_success()
+
+    def call(self, method, **kwargs):
+        """Выполняет вызов Slack API и ждёт ответ."""
+        return self.submit(method, **kwargs).result()
+
+    def __getattr__(self, name):
+        if name.startswith('_') or 'client' not in self.__dict__:
+            raise AttributeError(name)
+
+        def method(**kwargs):
+            return self.call(name, **kwargs)
+
+        return method
@@ -0,0 +1,102 @@
+import heapq
+from datetime import datetime
+import pytz
+from shift_scheduler import ShiftScheduler
+
+KYIV = pytz.timezone('Europe/Kyiv')
+
+# 2026-10-19 — понедельник
+MONDAY = 19
+
+
+def at(day, hour, minute=0):
+    return KYIV.localize(datetime(2026, 10, day, hour, minute))
+
+
+def scheduler():
+    return ShiftScheduler(queue_manager=None, announce=None)
+
+
+DAY_SHIFT = {'days': [0, 1, 2, 3, 4], 'start': '09:00', 'end': '17:00', 'pause_start': '13:00', 'pause_end': '14:00'}
+NIGHT_SHIFT = {'days': [4], 'start': '22:00', 'end': '06:00'}
+
+
+def test_next_occurrence_same_day():
+    assert scheduler().next_occurrence(DAY_SHIFT, 'start', at(MONDAY, 8)) == at(MONDAY, 9)
+
+
+def test_next_occurrence_skips_weekend():
+    friday_evening = at(MONDAY + 4, 18)
+    assert scheduler().next_occurrence(DAY_SHIFT, 'start', friday_evening) == at(MONDAY + 7, 9)
+
+
+def test_next_occurrence_is_strictly_after():
+    assert scheduler().next_occurrence(DAY_SHIFT, 'start', at(MONDAY, 9)) == at(MONDAY + 1, 9)
+
+
+def test_next_occurrence_overnight_end_is_next_day():
+    # Ночная смена в пятницу заканчивается в субботу в 06:00
+    assert scheduler().next_occurrence(NIGHT_SHIFT, 'end', at(MONDAY + 4, 23)) == at(MONDAY + 5, 6)
+
+
+def test_next_occurrence_overnight_end_wraps_week():
+    # Смена с воскресенья на понедельник: конец в понедельник, после перехода через конец недели
+    shift = {'days': [6], 'start': '23:00', 'end': '03:00'}
+    assert scheduler().next_occurrence(shift, 'end', at(MONDAY + 6, 23, 30)) == at(MONDAY + 7, 3)
+
+
+def test_next_occurrence_across_dst_change():
+    # 25.10.2026 Киев переходит на зимнее время, смещение меняется с +03:00 на +02:00
+    shift = {'days': list(range(7)), 'start': '09:00', 'end': '17:00'}
+    moment = scheduler().next_occurrence(shift, 'start', at(24, 10))
+    assert moment == at(25, 9)
+    assert moment.utcoffset().total_seconds() == 2 * 3600
+
+
+def test_is_active_day_shift():
+    s = scheduler()
+    assert s.is_active(DAY_SHIFT, 'start', 'end', at(MONDAY, 10))
+    assert not s.is_active(DAY_SHIFT, 'start', 'end', at(MONDAY, 18))
+    assert not s.is_active(DAY_SHIFT, 'start', 'end', at(MONDAY + 5, 10))
+
+
+def test_is_active_pause_window():
+    s = scheduler()
+    assert s.is_active(DAY_SHIFT, 'pause_start', 'pause_end', at(MONDAY, 13, 30))
+    assert not s.is_active(DAY_SHIFT, 'pause_start', 'pause_end', at(MONDAY, 14, 30))
+
+
+def test_is_active_overnight_shift():
+    s = scheduler()
+    assert s.is_active(NIGHT_SHIFT, 'start', 'end', at(MONDAY + 4, 23))
+    assert s.is_active(NIGHT_SHIFT, 'start', 'end', at(MONDAY + 5, 5))
+    assert not s.is_active(NIGHT_SHIFT, 'start', 'end', at(MONDAY + 5, 7))
+    # В четверг ночью смены нет
+    assert not s.is_active(NIGHT_SHIFT, 'start', 'end', at(MONDAY + 3, 23))
+
+
+def test_pop_due_orders_and_reschedules():
+    s = scheduler()
+    early = {'days': list(range(7)), 'start': '09:00', 'end': '17:00'}
+    late = {'days': list(range(7)), 'start': '17:00', 'end': '23:00'}
+    s.push(at(MONDAY, 17), 'U1', early, 'end')
+    s.push(at(MONDAY, 17), 'U2', late, 'start')
+    s.push(at(MONDAY, 23), 'U2', late, 'end')
+
+    changes = s.pop_due(at(MONDAY, 17))
+
+    # Конец смены применяется раньше начала следующей в том же пакете
+    assert changes == [('remove', 'U1'), ('add', 'U2')]
+    pending = sorted((moment, user_id, boundary) for moment, _, user_id, _, boundary in s.heap)
+    assert pending == [
+        (at(MONDAY, 23), 'U2', 'end'),
+        (at(MONDAY + 1, 17), 'U1', 'end'),
+        (at(MONDAY + 1, 17), 'U2', 'start'),
+    ]
+
+
+def test_pop_due_returns_nothing_before_boundary():
+    s = scheduler()
+    s.push(at(MONDAY, 9), 'U1', DAY_SHIFT, 'start')
+    assert s.pop_due(at(MONDAY, 8, 59)) == []
+    assert len(s.heap) == 1 and heapq.nsmallest(1, s.heap)[0][0] == at(MONDAY, 9)